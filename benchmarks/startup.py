@@ -0,0 +1,147 @@
+"""
+Benchmark de inicialização dos perfis de configuração.
+
+Para cada perfil (`config.settings` e `config.settings_api`) mede, em
+processos Python novos:
+
+- `import`: tempo para importar `config.wsgi` (carrega o Django, os apps e os middlewares).
+- `primeira requisição`: tempo da primeira requisição WSGI após o import.
+- `requisição`: tempo médio de uma requisição WSGI já "aquecida".
+- `middlewares`: custo dos middlewares por requisição (requisição completa
+  menos a mesma requisição em um `WSGIHandler` criado com `MIDDLEWARE = []`;
+  resolução de URL, `WSGIRequest` e a view entram nas duas medições).
+
+A requisição usada é `GET /transactions/` sem token, que é respondida com
+401 pelo DRF sem acessar o banco de dados.
+
+Uso (na raiz do projeto):
+
+    python benchmarks/startup.py [--runs 5] [--requests 2000]
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PROFILES = ['config.settings', 'config.settings_api']
+
+REQUEST_PATH = '/transactions/'
+
+
+def _environ():
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {'PATH_INFO': REQUEST_PATH, 'REQUEST_METHOD': 'GET', 'wsgi.input': io.BytesIO()}
+    setup_testing_defaults(environ)
+    return environ
+
+
+def _start_response(status, headers, exc_info=None):
+    pass
+
+
+def _time_requests(handler, requests):
+    """
+    Tempo médio de uma requisição WSGI no `handler`, após uma requisição de aquecimento.
+    """
+
+    handler(_environ(), _start_response)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        handler(_environ(), _start_response)
+    return (time.perf_counter() - start) / requests
+
+
+def child(requests):
+    """
+    Executado em um processo novo: mede o perfil definido em DJANGO_SETTINGS_MODULE.
+    """
+
+    sys.path.insert(0, str(BASE_DIR))
+
+    start = time.perf_counter()
+    from config.wsgi import application
+    import_time = time.perf_counter() - start
+
+    # Evita medir a escrita do log "Unauthorized" de cada requisição
+    logging.disable(logging.WARNING)
+
+    start = time.perf_counter()
+    application(_environ(), _start_response)
+    first_request = time.perf_counter() - start
+
+    # Requisição completa (WSGI + middlewares + view)
+    full_request = _time_requests(application, requests)
+
+    # Mesmo handler, sem os middlewares
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+
+    middleware = settings.MIDDLEWARE
+    settings.MIDDLEWARE = []
+    without_middleware = _time_requests(WSGIHandler(), requests)
+    settings.MIDDLEWARE = middleware
+
+    print(json.dumps({
+        "import": import_time,
+        "first_request": first_request,
+        "request": full_request,
+        "middleware": full_request - without_middleware,
+    }))
+
+
+def run_profile(profile, runs, requests):
+    """
+    Executa `runs` processos novos para o perfil e devolve a mediana de cada métrica.
+    """
+
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', '--requests', str(requests)],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': profile},
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {metric: statistics.median(result[metric] for result in results) for metric in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização dos perfis de configuração.")
+    parser.add_argument('--runs', type=int, default=5, help="Processos novos por perfil (padrão: 5).")
+    parser.add_argument('--requests', type=int, default=2000, help="Requisições para medir o tempo médio (padrão: 2000).")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.requests)
+        return
+
+    print(f"{'perfil':<22}{'import':>12}{'1ª requisição':>16}{'requisição':>14}{'middlewares':>14}")
+    for profile in PROFILES:
+        result = run_profile(profile, args.runs, args.requests)
+        print(
+            f"{profile:<22}"
+            f"{result['import'] * 1000:>10.1f}ms"
+            f"{result['first_request'] * 1000:>14.2f}ms"
+            f"{result['request'] * 1e6:>12.1f}µs"
+            f"{result['middleware'] * 1e6:>12.1f}µs"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -86,6 +86,32 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Cada atomic() já começa com o lock de escrita (BEGIN IMMEDIATE):
+            # escritas concorrentes esperam na fila (até `timeout` segundos)
+            # em vez de falhar com "database is locked" no meio da transação
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Banco de testes em arquivo, para que os testes com várias threads
+        # usem o mesmo mecanismo de lock que o banco real
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Cache compartilhado entre os workers (o padrão, LocMemCache, é por processo e
+# não veria as invalidações feitas por outro worker). Crie a tabela com:
+#   python manage.py createcachetable
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
     }
 }
 
@@ -147,4 +173,7 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
-}
\ No newline at end of file
+}
+
+# Tempo de validade das respostas armazenadas pelo header `Idempotency-Key`
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
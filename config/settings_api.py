@@ -0,0 +1,42 @@
+"""
+Perfil "API-only" das configurações do projeto.
+
+Reaproveita `config.settings` e remove os apps e middlewares que a API não
+usa (admin, sessões, mensagens, arquivos estáticos, CSRF), já que toda a
+autenticação é feita por JWT. Diminui o tempo de inicialização dos workers
+e o custo de cada requisição.
+
+Para usar, defina a variável de ambiente antes de subir o servidor:
+
+    DJANGO_SETTINGS_MODULE=config.settings_api
+"""
+
+from .settings import *  # noqa: F401,F403
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'corsheaders',
+    'transaction_api',
+]
+
+MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+# Sem o admin e sem a API navegável, não há templates para renderizar
+TEMPLATES = []
+
+# Apenas JSON (a API navegável depende de templates, sessões e arquivos estáticos)
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+    ),
+}
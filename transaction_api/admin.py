@@ -1,4 +1,50 @@
 from django.contrib import admin
-from .models import Transaction
+from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+from .models import Transaction, TransactionChange
+from .serializers import TransactionSerializer
+from .changelog import record_change
+from .analytics import invalidate_analytics
 
-admin.site.register(Transaction)
\ No newline at end of file
+
+@admin.register(Transaction)
+class TransactionAdmin(admin.ModelAdmin):
+    """
+    Admin das transações, registrando as escritas no log de alterações
+    (como as views), para que a sincronização incremental as enxergue.
+    """
+
+    def save_model(self, request, obj, form, change):
+        op = TransactionChange.Operation.UPDATE if change else TransactionChange.Operation.CREATE
+
+        # Transação movida para outro usuário: o dono anterior recebe um tombstone
+        previous_owner = None
+        if change and 'user' in form.changed_data:
+            previous_owner = User.objects.get(pk=form.initial['user'])
+
+        with db_transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if previous_owner is not None:
+                record_change(previous_owner, TransactionChange.Operation.DELETE, obj.id)
+            record_change(obj.user, op, obj.id, TransactionSerializer(obj).data)
+
+        invalidate_analytics(obj.user)
+        if previous_owner is not None:
+            invalidate_analytics(previous_owner)
+
+    def delete_model(self, request, obj):
+        with db_transaction.atomic():
+            record_change(obj.user, TransactionChange.Operation.DELETE, obj.id)
+            super().delete_model(request, obj)
+        invalidate_analytics(obj.user)
+
+    def delete_queryset(self, request, queryset):
+        with db_transaction.atomic():
+            transactions = list(queryset.select_related('user'))
+            TransactionChange.objects.bulk_create([
+                TransactionChange(user=obj.user, op=TransactionChange.Operation.DELETE, transaction_id=obj.id)
+                for obj in transactions
+            ])
+            super().delete_queryset(request, queryset)
+        for user in {obj.user for obj in transactions}:
+            invalidate_analytics(user)
@@ -0,0 +1,184 @@
+import logging
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import Case, CharField, Count, IntegerField, Sum, Value, When
+from django.db.models.functions import Cast, ExtractIsoWeekDay, Left
+
+from .models import Transaction
+from .serializers import TransactionSerializer
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores (exclusivos) das faixas de valor; a última faixa é aberta
+AMOUNT_BUCKETS = [Decimal('10'), Decimal('50'), Decimal('100'), Decimal('500'), Decimal('1000'), Decimal('5000')]
+
+# Tempo (em segundos) que o resultado fica em cache
+ANALYTICS_CACHE_TIMEOUT = 60 * 15
+
+TYPES = [choice.value for choice in Transaction.TransactionType]
+
+
+def _empty_totals():
+    return {transaction_type: {"count": 0, "total": Decimal('0')} for transaction_type in TYPES}
+
+
+def _group(rows, key):
+    """
+    Agrupa as linhas agregadas (`key`, `type`, `count`, `total`) em um
+    dicionário `{valor_da_chave: {type: {count, total}}}`.
+
+    Itera apenas sobre os grupos devolvidos pelo banco, nunca sobre as transações.
+    """
+
+    groups = {}
+    for row in rows:
+        totals = groups.setdefault(row[key], _empty_totals())
+        totals[row['type']] = {"count": row['count'], "total": row['total']}
+    return groups
+
+
+class IsoWeekDay(ExtractIsoWeekDay):
+    """
+    Dia da semana ISO (1 = segunda-feira ... 7 = domingo).
+
+    No SQLite, o `ExtractIsoWeekDay` do Django vira uma função Python
+    (`django_date_extract`) chamada para cada linha; aqui usamos o `strftime`
+    nativo. Nos outros bancos, o `EXTRACT` nativo do Django é mantido.
+    """
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.lhs)
+        weekday = f"CAST(strftime(%s, {sql}) AS INTEGER)"
+        return f"CASE {weekday} WHEN 0 THEN 7 ELSE {weekday} END", ('%w', *params, '%w', *params)
+
+
+def _month_expression():
+    """
+    Mês da transação no formato `YYYY-MM`, usando apenas funções SQL nativas
+    (o `TruncMonth` do Django também vira uma função Python no SQLite).
+    """
+
+    return Left(Cast('date', output_field=CharField()), 7)
+
+
+def _bucket_expression():
+    """
+    Expressão SQL que devolve o índice da faixa de valor de cada transação.
+    """
+
+    whens = [When(amount__lt=limit, then=Value(index)) for index, limit in enumerate(AMOUNT_BUCKETS)]
+    return Case(*whens, default=Value(len(AMOUNT_BUCKETS)), output_field=IntegerField())
+
+
+def compute_analytics(user, top=5):
+    """
+    Calcula os histogramas das transações do usuário.
+
+    Usa um número fixo de consultas agregadas (GROUP BY), independente da
+    quantidade de transações: totais por tipo, faixas de valor, dias da
+    semana, meses e as maiores despesas.
+    """
+
+    transactions = Transaction.objects.filter(user=user)
+    aggregates = {"count": Count('id'), "total": Sum('amount')}
+
+    # Totais por tipo
+    totals = _empty_totals()
+    for row in transactions.values('type').annotate(**aggregates).order_by():
+        totals[row['type']] = {"count": row['count'], "total": row['total']}
+
+    # Faixas de valor
+    buckets = _group(
+        transactions.annotate(bucket=_bucket_expression()).values('bucket', 'type').annotate(**aggregates).order_by(),
+        'bucket'
+    )
+    lower_limits = [Decimal('0')] + AMOUNT_BUCKETS
+    upper_limits = AMOUNT_BUCKETS + [None]
+    amount_buckets = [
+        {"min": lower_limits[index], "max": upper_limits[index], **buckets.get(index, _empty_totals())}
+        for index in range(len(lower_limits))
+    ]
+
+    # Dias da semana (1 = segunda-feira ... 7 = domingo)
+    weekdays = _group(
+        transactions.annotate(weekday=IsoWeekDay('date')).values('weekday', 'type').annotate(**aggregates).order_by(),
+        'weekday'
+    )
+    weekdays = [{"weekday": weekday, **weekdays.get(weekday, _empty_totals())} for weekday in range(1, 8)]
+
+    # Meses (apenas os que possuem transações)
+    months = _group(
+        transactions.annotate(month=_month_expression()).values('month', 'type').annotate(**aggregates).order_by(),
+        'month'
+    )
+    months = [{"month": month, **months[month]} for month in sorted(months)]
+
+    # Maiores despesas
+    top_expenses = transactions.filter(type=Transaction.TransactionType.EXPENSE).order_by('-amount', '-date', '-id')[:top]
+
+    return {
+        "totals": totals,
+        "amount_buckets": amount_buckets,
+        "weekdays": weekdays,
+        "months": months,
+        "top_expenses": TransactionSerializer(top_expenses, many=True).data,
+    }
+
+
+def _version_key(user):
+    return f"analytics:version:{user.pk}"
+
+
+def get_analytics(user, top=5):
+    """
+    Retorna os histogramas do usuário, usando o cache quando disponível.
+
+    A chave do cache inclui uma versão por usuário, trocada a cada escrita
+    (ver `invalidate_analytics`); entradas antigas apenas expiram. Se o cache
+    estiver indisponível, os histogramas são calculados direto no banco.
+    """
+
+    try:
+        version = cache.get(_version_key(user))
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(_version_key(user), version, None)
+
+        key = f"analytics:{user.pk}:{version}:{top}"
+        result = cache.get(key)
+    except Exception:
+        logger.exception("Cache indisponível ao ler o analytics do usuário %s", user.pk)
+        return compute_analytics(user, top)
+
+    if result is None:
+        result = compute_analytics(user, top)
+        try:
+            cache.set(key, result, ANALYTICS_CACHE_TIMEOUT)
+        except Exception:
+            logger.exception("Cache indisponível ao gravar o analytics do usuário %s", user.pk)
+
+    return result
+
+
+def invalidate_analytics(user):
+    """
+    Invalida os histogramas em cache do usuário (chamado após cada escrita).
+
+    Se houver uma transação de banco aberta, a invalidação só ocorre no commit,
+    para que uma leitura concorrente não coloque dados antigos no cache.
+    Uma falha do cache é apenas registrada no log: a escrita já foi
+    confirmada e não pode virar um erro para o cliente (que tentaria de novo).
+    """
+
+    version_key = _version_key(user)
+
+    def delete_version():
+        try:
+            cache.delete(version_key)
+        except Exception:
+            logger.exception("Não foi possível invalidar o analytics do usuário %s", user.pk)
+
+    db_transaction.on_commit(delete_version)
@@ -0,0 +1,73 @@
+from django.db import transaction as db_transaction
+from django.db.models import Exists, Max, OuterRef
+
+from .models import ChangeLogHorizon, TransactionChange
+
+
+def record_change(user, op, transaction_id, snapshot=None):
+    """
+    Registra uma entrada no log de alterações do usuário.
+
+    Deve ser chamada dentro do mesmo `atomic()` da escrita na transação,
+    para que o log nunca fique fora de sincronia com a tabela.
+    """
+
+    return TransactionChange.objects.create(
+        user=user,
+        op=op,
+        transaction_id=transaction_id,
+        snapshot=snapshot
+    )
+
+
+def get_horizon(user):
+    """
+    Retorna o menor cursor aceito para a sincronização incremental do usuário.
+    """
+
+    return ChangeLogHorizon.objects.filter(user=user).values_list('seq', flat=True).first() or 0
+
+
+def compact_changes(older_than):
+    """
+    Compacta o log de alterações de todos os usuários.
+
+    - Remove entradas substituídas por uma alteração mais recente da mesma
+      transação (o cliente só precisa do último estado de cada uma).
+    - Remove tombstones criados antes de `older_than` e avança o horizonte
+      do usuário, para que cursores antigos sejam obrigados a ressincronizar.
+
+    Retorna a quantidade de entradas removidas.
+    """
+
+    with db_transaction.atomic():
+
+        # Entradas que possuem uma alteração posterior para a mesma transação
+        newer = TransactionChange.objects.filter(
+            user=OuterRef('user'),
+            transaction_id=OuterRef('transaction_id'),
+            seq__gt=OuterRef('seq')
+        )
+        superseded, _ = TransactionChange.objects.filter(Exists(newer)).delete()
+
+        # Tombstones antigos
+        tombstones = TransactionChange.objects.filter(
+            op=TransactionChange.Operation.DELETE,
+            created_at__lt=older_than
+        )
+
+        horizons = [
+            ChangeLogHorizon(user_id=row['user'], seq=row['max_seq'])
+            for row in tombstones.values('user').annotate(max_seq=Max('seq'))
+        ]
+        ChangeLogHorizon.objects.bulk_create(
+            horizons,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['seq']
+        )
+
+        purged, _ = tombstones.delete()
+
+    return superseded + purged
+
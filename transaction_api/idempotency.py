@@ -0,0 +1,135 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import OperationalError, transaction as db_transaction
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# Métodos em que o header é respeitado
+IDEMPOTENT_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+def get_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+
+
+def _fingerprint(request):
+    """
+    Gera um hash da requisição para detectar a reutilização da chave com outro conteúdo.
+    """
+
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f"{request.method}\n{request.path}\n{body}".encode()).hexdigest()
+
+
+def _replay(record, fingerprint):
+    """
+    Devolve a resposta armazenada, sem executar a view novamente.
+    """
+
+    if record.fingerprint != fingerprint:
+        return Response(
+            {"detail": f"A chave `{IDEMPOTENCY_HEADER}` já foi usada com outra requisição."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    return Response(record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view):
+    """
+    Decorator que adiciona suporte ao header `Idempotency-Key` nas escritas.
+
+    Deve ser aplicado abaixo de `@api_view`/`@permission_classes`, pois
+    depende do usuário já autenticado. A chave é registrada e a view é
+    executada dentro do mesmo `atomic()`, então requisições duplicadas
+    simultâneas são serializadas e recebem a resposta armazenada. No SQLite,
+    isso depende do `transaction_mode = IMMEDIATE` (ver `config/settings.py`),
+    já que o `select_for_update()` não tem efeito. Se o lock não for obtido a
+    tempo, responde 409 para o cliente tentar de novo.
+    Respostas 5xx não são armazenadas.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or request.method not in IDEMPOTENT_METHODS:
+            return view(request, *args, **kwargs)
+
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response({"detail": f"`{IDEMPOTENCY_HEADER}` muito longo."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = _fingerprint(request)
+        now = timezone.now()
+
+        # Caminho rápido: repetição de uma requisição já concluída (uma única consulta)
+        record = IdempotencyKey.objects.filter(user=request.user, key=key, expires_at__gt=now).first()
+        if record is not None:
+            return _replay(record, fingerprint)
+
+        # Uma requisição simultânea com a mesma chave espera o lock da primeira
+        # (SELECT ... FOR UPDATE / BEGIN IMMEDIATE no SQLite) e, depois, encontra
+        # o registro dela e devolve a resposta armazenada
+        try:
+            with db_transaction.atomic():
+                record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+                    user=request.user,
+                    key=key,
+                    defaults={"fingerprint": fingerprint, "expires_at": now + get_ttl()}
+                )
+
+                if not created:
+                    if record.expires_at > now:
+                        return _replay(record, fingerprint)
+
+                    # Chave expirada ainda não removida: reaproveita o registro
+                    record.fingerprint = fingerprint
+                    record.expires_at = now + get_ttl()
+
+                response = view(request, *args, **kwargs)
+
+                if response.status_code >= 500:
+                    record.delete()
+                    return response
+
+                record.status_code = response.status_code
+                record.response_body = response.data
+                record.save()
+
+                return response
+
+        except OperationalError as error:
+            # O lock não foi obtido dentro do timeout do banco: a primeira
+            # requisição ainda está em andamento e o cliente deve tentar de novo
+            if 'locked' not in str(error):
+                raise
+
+            return Response(
+                {"detail": f"Uma requisição com esta `{IDEMPOTENCY_HEADER}` ainda está em andamento."},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Retry-After': '1'}
+            )
+
+    return wrapper
+
+
+def purge_expired_keys(now=None):
+    """
+    Remove as chaves expiradas (consulta única usando o índice de `expires_at`).
+
+    Retorna a quantidade de chaves removidas.
+    """
+
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from transaction_api.changelog import compact_changes
+
+
+class Command(BaseCommand):
+    help = "Compacta o log de alterações das transações (change feed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help="Tombstones mais antigos que este número de dias são removidos (padrão: 30)."
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['days'])
+        removed = compact_changes(older_than)
+        self.stdout.write(self.style.SUCCESS(f"{removed} entradas removidas do log de alterações."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from transaction_api.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Remove as chaves de idempotência expiradas."
+
+    def handle(self, *args, **options):
+        removed = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f"{removed} chaves de idempotência removidas."))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('transaction_api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogHorizon',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='change_log_horizon', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('seq', models.BigIntegerField(default=0, verbose_name='Sequência compactada')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TransactionChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('op', models.CharField(choices=[('create', 'Criação'), ('update', 'Atualização'), ('delete', 'Deleção')], max_length=6, verbose_name='Operação')),
+                ('transaction_id', models.BigIntegerField(verbose_name='Transação')),
+                ('snapshot', models.JSONField(blank=True, null=True, verbose_name='Snapshot')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'seq'], name='change_user_seq_idx'), models.Index(fields=['user', 'transaction_id', 'seq'], name='change_user_tx_seq_idx')],
+            },
+        ),
+    ]
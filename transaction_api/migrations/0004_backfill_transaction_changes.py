@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def snapshot(transaction):
+    """
+    Mesmo formato do `TransactionSerializer` no momento desta migração, montado
+    a partir dos campos do modelo histórico (o serializer atual pode ler campos
+    que ainda não existem neste ponto das migrações).
+    """
+
+    return {
+        "id": transaction.id,
+        "description": transaction.description,
+        "amount": str(transaction.amount.quantize(Decimal('0.01'))),
+        "type": transaction.type,
+        "date": transaction.date.isoformat(),
+    }
+
+
+def backfill_changes(apps, schema_editor):
+    """
+    Cria uma entrada `create` no log para cada transação já existente, para que
+    a sincronização completa (`?since=0`) devolva também os dados anteriores ao log.
+    """
+
+    Transaction = apps.get_model('transaction_api', 'Transaction')
+    TransactionChange = apps.get_model('transaction_api', 'TransactionChange')
+
+    # Transações que já possuem alguma entrada no log não são duplicadas
+    logged = TransactionChange.objects.values('transaction_id')
+    transactions = Transaction.objects.exclude(id__in=logged).order_by('id')
+
+    batch = []
+    for transaction in transactions.iterator(chunk_size=BATCH_SIZE):
+        batch.append(TransactionChange(
+            user_id=transaction.user_id,
+            op='create',
+            transaction_id=transaction.id,
+            snapshot=snapshot(transaction)
+        ))
+
+        if len(batch) == BATCH_SIZE:
+            TransactionChange.objects.bulk_create(batch)
+            batch = []
+
+    TransactionChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction_api', '0003_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """
+    Cria a tabela do cache compartilhado (`CACHES` com `DatabaseCache`), para
+    que o `migrate` seja suficiente na atualização. Tabelas já existentes são
+    mantidas; com outro backend de cache, não faz nada.
+    """
+
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction_api', '0004_backfill_transaction_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from decimal import Decimal
 from django.contrib.auth.models import User # Importe o modelo de Usuário padrão
 
@@ -49,4 +50,146 @@ class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
 
     def __str__(self):
-        return f"{self.description} ({self.get_type_display()} - {self.amount})"
\ No newline at end of file
+        return f"{self.description} ({self.get_type_display()} - {self.amount})"
+
+class TransactionChange(models.Model):
+    """
+    Registro do log de alterações (change feed) das transações de um usuário.
+
+    Cada criação, atualização ou deleção gera uma entrada com o estado da
+    transação naquele momento. O `seq` é crescente, então serve de cursor
+    para a sincronização incremental (`?since=<seq>`).
+    """
+
+    # ========================================
+    # ENUMS
+    # ========================================
+
+    class Operation(models.TextChoices):
+        CREATE = 'create', 'Criação'
+        UPDATE = 'update', 'Atualização'
+        DELETE = 'delete', 'Deleção'
+
+    # ========================================
+    # CAMPOS
+    # ========================================
+
+    seq = models.BigAutoField(primary_key=True)
+
+    op = models.CharField(
+        max_length=6,
+        choices=Operation.choices,
+        verbose_name="Operação"
+    )
+
+    # Não é uma chave estrangeira: a transação pode já ter sido deletada (tombstone)
+    transaction_id = models.BigIntegerField(
+        verbose_name="Transação"
+    )
+
+    # Estado serializado da transação (nulo nas deleções)
+    snapshot = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Snapshot"
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Criado em"
+    )
+
+    # ========================================
+    # CHAVES ESTRANGEIRAS
+    # ========================================
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transaction_changes')
+
+    class Meta:
+        indexes = [
+            # Consulta da sincronização: WHERE user_id = ? AND seq > ? ORDER BY seq
+            models.Index(fields=['user', 'seq'], name='change_user_seq_idx'),
+            # Compactação: localizar entradas anteriores da mesma transação
+            models.Index(fields=['user', 'transaction_id', 'seq'], name='change_user_tx_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.get_op_display()} - transação {self.transaction_id}"
+
+
+class ChangeLogHorizon(models.Model):
+    """
+    Guarda, por usuário, o maior `seq` de tombstone já removido pela compactação.
+
+    Clientes com cursor abaixo desse valor podem ter perdido deleções e
+    precisam refazer a sincronização completa (`?since=0`).
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='change_log_horizon')
+
+    seq = models.BigIntegerField(
+        default=0,
+        verbose_name="Sequência compactada"
+    )
+
+    def __str__(self):
+        return f"{self.user} - compactado até #{self.seq}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Resposta armazenada de uma escrita feita com o header `Idempotency-Key`.
+
+    Uma nova requisição com a mesma chave (do mesmo usuário) recebe a resposta
+    armazenada, sem executar a escrita novamente, até a chave expirar.
+    """
+
+    # ========================================
+    # CAMPOS
+    # ========================================
+
+    key = models.CharField(
+        max_length=255,
+        verbose_name="Chave"
+    )
+
+    # Hash do método, caminho e corpo da requisição original
+    fingerprint = models.CharField(
+        max_length=64,
+        verbose_name="Assinatura da requisição"
+    )
+
+    status_code = models.PositiveSmallIntegerField(
+        null=True,
+        verbose_name="Status da resposta"
+    )
+
+    response_body = models.JSONField(
+        null=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name="Corpo da resposta"
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Criado em"
+    )
+
+    expires_at = models.DateTimeField(
+        db_index=True,
+        verbose_name="Expira em"
+    )
+
+    # ========================================
+    # CHAVES ESTRANGEIRAS
+    # ========================================
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user})"
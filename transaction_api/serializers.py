@@ -1,7 +1,12 @@
 from rest_framework import serializers
-from .models import Transaction
+from .models import Transaction, TransactionChange
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
-        exclude = ['user']
\ No newline at end of file
+        exclude = ['user']
+
+class TransactionChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TransactionChange
+        fields = ['seq', 'op', 'transaction_id', 'snapshot']
@@ -0,0 +1,341 @@
+import re
+from datetime import date
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from .models import Transaction, TransactionChange
+from .serializers import TransactionSerializer
+from .views import CHANGES_PAGE_SIZE
+
+# ========================================
+# VOLUME DOS DADOS
+# ========================================
+
+USERS = 4
+ROWS_PER_USER = 1500
+
+# Quantidade de alterações após o cursor da sincronização incremental
+CHANGES_SINCE = 10
+
+# ========================================
+# ORÇAMENTOS POR ENDPOINT
+# ========================================
+
+# Único lugar a ser atualizado quando uma mudança intencional alterar o custo
+# de um endpoint:
+# - `queries`: quantidade exata de consultas SQL (inclui os SAVEPOINT/RELEASE
+#   dos blocos `atomic()`, já que os testes rodam dentro de uma transação).
+# - `rows`: limite superior de linhas lidas, estimado pelo `EXPLAIN QUERY PLAN`
+#   de cada consulta (ver `estimate_rows`). Um full scan de qualquer tabela
+#   (USERS * ROWS_PER_USER linhas) estoura todos os limites.
+# - `plan` (opcional): trechos que devem aparecer no `EXPLAIN QUERY PLAN` das
+#   consultas, por exemplo o índice que limita a leitura.
+# - `table` (opcional): conta só as consultas (e linhas) que leem esta tabela.
+#   Usado no analytics, para que as consultas internas do cache compartilhado
+#   (DatabaseCache) não façam parte do orçamento.
+
+BUDGETS = {
+    'list':               {'queries': 2, 'rows': 2 * ROWS_PER_USER},
+    'detail':             {'queries': 1, 'rows': 1, 'plan': ['USING INTEGER PRIMARY KEY (rowid=?)']},
+    'create':             {'queries': 4, 'rows': 0},
+    'create_idempotent':  {'queries': 12, 'rows': 3},
+    'create_replay':      {'queries': 1, 'rows': 1},
+    'update':             {'queries': 5, 'rows': 2},
+    'delete':             {'queries': 5, 'rows': 2},
+    'summary':            {'queries': 2, 'rows': 2 * ROWS_PER_USER},
+    'changes_full':       {'queries': 1, 'rows': CHANGES_PAGE_SIZE + 1, 'plan': ['USING INDEX change_user_seq_idx (user_id=? AND seq>?)']},
+    'changes':            {'queries': 2, 'rows': CHANGES_SINCE + 1, 'plan': ['USING INDEX change_user_seq_idx (user_id=? AND seq>?)']},
+    'analytics':          {'queries': 5, 'rows': 5 * ROWS_PER_USER, 'table': Transaction._meta.db_table},
+    'analytics_cached':   {'queries': 0, 'rows': 0, 'table': Transaction._meta.db_table},
+}
+
+# Combinações de filtros e ordenação da listagem
+LIST_FILTERS = [{}, {'description': 'mercado'}, {'type': 'expense'}, {'description': 'mercado', 'type': 'expense'}]
+LIST_ORDERS = [None, 'date', '-date', 'amount', '-amount']
+
+# Combinações de filtros e ordenação do resumo
+SUMMARY_FILTERS = [{}, {'description': 'mercado'}]
+
+PLAN_TABLE = re.compile(r'^(SCAN|SEARCH) (\w+)')
+PLAN_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\w+) \((.+)\)$')
+EQUALITY = re.compile(r'^(\w+)=\?$')
+
+
+def explain(sql):
+    """
+    Devolve os passos (coluna `detail`) do `EXPLAIN QUERY PLAN` da consulta.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[3] for row in cursor.fetchall()]
+
+
+def index_definition(cursor, table, index):
+    """
+    Devolve as colunas do índice (na ordem) e se ele é único.
+    """
+
+    cursor.execute(f'PRAGMA index_list("{table}")')
+    unique = any(row[1] == index and row[2] for row in cursor.fetchall())
+
+    cursor.execute(f'PRAGMA index_info("{index}")')
+    return [row[2] for row in cursor.fetchall()], unique
+
+
+def is_bounded_range(sql, plan, table, columns):
+    """
+    Indica se a leitura pelo índice para após as linhas devolvidas: a consulta
+    tem `ORDER BY ... LIMIT` resolvido pelo próprio índice (sem ordenação
+    temporária) e nenhum filtro além das colunas do índice.
+    """
+
+    if not sql.startswith('SELECT') or ' ORDER BY ' not in sql or ' LIMIT ' not in sql:
+        return False
+
+    if any('TEMP B-TREE' in detail for detail in plan):
+        return False
+
+    where = sql.partition(' WHERE ')[2].partition(' ORDER BY ')[0]
+    filtered = set(re.findall(rf'"{table}"\."(\w+)"', where))
+    return filtered <= set(columns)
+
+
+def estimate_rows(sql, plan, user):
+    """
+    Estima o máximo de linhas lidas por uma consulta a partir do `EXPLAIN QUERY PLAN`.
+
+    - `SEARCH ... (rowid=?)`: 1 linha.
+    - `SEARCH` por igualdade em todas as colunas de um índice único: 1 linha.
+    - `SEARCH` por faixa em um índice, com `ORDER BY ... LIMIT` resolvido pelo
+      índice e sem outros filtros: as linhas devolvidas pela consulta.
+    - Outro `SEARCH` cujas colunas iniciais incluem `user_id=?`: todas as
+      linhas do usuário na tabela.
+    - Qualquer outro `SEARCH` ou `SCAN`: todas as linhas da tabela.
+    """
+
+    rows = 0
+    for detail in plan:
+        match = PLAN_TABLE.match(detail)
+        if match is None:
+            continue
+
+        table = match.group(2)
+        with connection.cursor() as cursor:
+            if 'rowid=?' in detail:
+                rows += 1
+                continue
+
+            index = PLAN_INDEX.search(detail) if match.group(1) == 'SEARCH' else None
+            terms = index.group(2).split(' AND ') if index else []
+            equal = [EQUALITY.match(term).group(1) for term in terms if EQUALITY.match(term)]
+
+            if index:
+                columns, unique = index_definition(cursor, table, index.group(1))
+
+                if unique and equal == columns:
+                    rows += 1
+                    continue
+
+                if len(equal) < len(terms) and is_bounded_range(sql, plan, table, columns):
+                    cursor.execute(f"SELECT COUNT(*) FROM ({sql})")
+                    rows += cursor.fetchone()[0]
+                    continue
+
+            if 'user_id' in equal:
+                cursor.execute(f'SELECT COUNT(*) FROM "{table}" WHERE user_id = %s', [user.pk])
+            else:
+                cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+            rows += cursor.fetchone()[0]
+
+    return rows
+
+
+@skipUnless(connection.vendor == 'sqlite', "As estimativas usam o EXPLAIN QUERY PLAN do SQLite.")
+class EndpointPerformanceTests(APITestCase):
+
+    # Massa de dados compartilhada entre os testes: várias contas com milhares de transações
+    @classmethod
+    def setUpTestData(cls):
+
+        descriptions = ['Mercado', 'Aluguel', 'Salário', 'Café', 'Transporte']
+
+        cls.users = [User.objects.create_user(username=f'usuario{index}', password='senha-teste') for index in range(USERS)]
+        for user in cls.users:
+            transactions = Transaction.objects.bulk_create([
+                Transaction(
+                    description=f"{descriptions[index % len(descriptions)]} {index}",
+                    amount=(index % 200) * 13 + 1,
+                    type='income' if index % 4 == 0 else 'expense',
+                    date=date(2023, index % 12 + 1, index % 28 + 1),
+                    user=user
+                )
+                for index in range(ROWS_PER_USER)
+            ])
+            TransactionChange.objects.bulk_create([
+                TransactionChange(
+                    user=user,
+                    op=TransactionChange.Operation.CREATE,
+                    transaction_id=transaction.id,
+                    snapshot=TransactionSerializer(transaction).data
+                )
+                for transaction in transactions
+            ])
+
+        cls.user = cls.users[0]
+        cls.transaction = Transaction.objects.filter(user=cls.user).first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def assertWithinBudget(self, budget, request):
+        """
+        Executa a requisição e verifica a quantidade exata de consultas e o
+        limite de linhas lidas definidos em `BUDGETS[budget]`.
+        """
+
+        expected = BUDGETS[budget]
+
+        table = expected.get('table')
+
+        if table is None:
+            with CaptureQueriesContext(connection) as context:
+                with self.assertNumQueries(expected['queries']):
+                    response = request()
+            queries = [query['sql'] for query in context.captured_queries]
+        else:
+            with CaptureQueriesContext(connection) as context:
+                response = request()
+            queries = [query['sql'] for query in context.captured_queries if f'"{table}"' in query['sql']]
+            self.assertEqual(len(queries), expected['queries'], f"{budget}: consultas em {table}\n" + "\n".join(queries))
+
+        self.assertLess(response.status_code, 400, response.data)
+
+        statements = [sql for sql in queries if sql.startswith(('SELECT', 'UPDATE', 'DELETE'))]
+        plans = {sql: explain(sql) for sql in statements}
+
+        rows = sum(estimate_rows(sql, plan, self.user) for sql, plan in plans.items())
+        self.assertLessEqual(rows, expected['rows'], f"{budget}: {rows} linhas estimadas\n" + "\n".join(statements))
+
+        details = [detail for plan in plans.values() for detail in plan]
+        for step in expected.get('plan', []):
+            self.assertTrue(any(step in detail for detail in details), f"{budget}: `{step}` ausente do plano\n" + "\n".join(details))
+
+        return response
+
+
+
+    # --- ===================  TESTE 1: LISTAGEM  =================== ---
+    def test_list_budget(self):
+        """
+        Testa o custo da listagem em todas as combinações de filtro e ordenação.
+        """
+
+        for filters in LIST_FILTERS:
+            for order_by in LIST_ORDERS:
+                params = {**filters, **({'order_by': order_by} if order_by else {})}
+                with self.subTest(**params):
+                    self.assertWithinBudget('list', lambda: self.client.get(reverse('create_list'), params))
+
+        # Páginas avançadas custam o mesmo
+        self.assertWithinBudget('list', lambda: self.client.get(reverse('create_list'), {'page': 100}))
+
+
+
+    # --- ===================  TESTE 2: TRANSAÇÃO ESPECÍFICA  =================== ---
+    def test_detail_budget(self):
+        """
+        Testa o custo da leitura de uma transação.
+        """
+
+        self.assertWithinBudget('detail', lambda: self.client.get(reverse('retrieve_update_delete', args=[self.transaction.id])))
+
+
+
+    # --- ===================  TESTE 3: ESCRITAS  =================== ---
+    def test_write_budgets(self):
+        """
+        Testa o custo da criação (com e sem idempotência), atualização e deleção.
+        """
+
+        data = {"description": "Nova", "amount": "10.00", "type": "expense", "date": "2023-12-01"}
+        url = reverse('create_list')
+        detail_url = reverse('retrieve_update_delete', args=[self.transaction.id])
+
+        self.assertWithinBudget('create', lambda: self.client.post(url, data, format='json'))
+        self.assertWithinBudget('create_idempotent', lambda: self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='chave'))
+        self.assertWithinBudget('create_replay', lambda: self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='chave'))
+
+        self.assertWithinBudget('update', lambda: self.client.patch(detail_url, {"amount": "20.00"}, format='json'))
+        self.assertWithinBudget('update', lambda: self.client.put(detail_url, data, format='json'))
+        self.assertWithinBudget('delete', lambda: self.client.delete(detail_url))
+
+
+
+    # --- ===================  TESTE 4: RESUMO  =================== ---
+    def test_summary_budget(self):
+        """
+        Testa o custo do resumo em todas as combinações de filtro e ordenação.
+        """
+
+        for filters in SUMMARY_FILTERS:
+            for order_by in LIST_ORDERS:
+                params = {**filters, **({'order_by': order_by} if order_by else {})}
+                with self.subTest(**params):
+                    self.assertWithinBudget('summary', lambda: self.client.get(reverse('summary'), params))
+
+
+
+    # --- ===================  TESTE 5: SINCRONIZAÇÃO  =================== ---
+    def test_changes_budget(self):
+        """
+        Testa o custo da sincronização incremental, completa e a partir de um cursor.
+        """
+
+        self.assertWithinBudget('changes_full', lambda: self.client.get(reverse('changes')))
+
+        cursor = TransactionChange.objects.filter(user=self.user).order_by('-seq').values_list('seq', flat=True)[CHANGES_SINCE]
+        response = self.assertWithinBudget('changes', lambda: self.client.get(reverse('changes'), {'since': cursor}))
+        self.assertEqual(len(response.data['changes']), CHANGES_SINCE)
+        self.assertIsNotNone(response.data['changes'][0]['snapshot'])
+
+
+
+    # --- ===================  TESTE 6: ANALYTICS  =================== ---
+    def test_analytics_budget(self):
+        """
+        Testa o custo do analytics sem cache e com cache.
+        """
+
+        self.assertWithinBudget('analytics', lambda: self.client.get(reverse('analytics')))
+        self.assertWithinBudget('analytics_cached', lambda: self.client.get(reverse('analytics')))
+
+
+
+    # --- ===================  TESTE 7: ESTIMATIVA DE LINHAS  =================== ---
+    def test_estimate_rows(self):
+        """
+        Testa se a estimativa só usa as linhas devolvidas quando o índice
+        limita a leitura (faixa + ORDER BY/LIMIT sem outros filtros).
+        """
+
+        changes = TransactionChange.objects.filter(user=self.user, seq__gt=0).order_by('seq')
+        user_rows = TransactionChange.objects.filter(user=self.user).count()
+
+        cases = [
+            (changes[:5], 5),
+            (changes.filter(op=TransactionChange.Operation.DELETE)[:5], user_rows),
+            (changes, user_rows),
+        ]
+        for queryset, expected in cases:
+            with CaptureQueriesContext(connection) as context:
+                list(queryset)
+            sql = context.captured_queries[0]['sql']
+            with self.subTest(sql=sql):
+                self.assertEqual(estimate_rows(sql, explain(sql), self.user), expected)
@@ -1,7 +1,24 @@
+from datetime import date, timedelta
+from time import sleep
+from decimal import Decimal
+from threading import Barrier, Thread
+from unittest import mock, skipUnless
+
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
-from .models import Transaction
+from .models import Transaction, TransactionChange, IdempotencyKey
+from .changelog import compact_changes
+from .idempotency import purge_expired_keys
+from . import views
 
 class TransactionTests(APITestCase):
 
@@ -250,3 +267,573 @@ class TransactionTests(APITestCase):
 
         self.assertEqual(response.data, expected_summary)
 
+
+
+class TransactionChangesTests(APITestCase):
+
+    # Configurações iniciais antes de rodar os testes
+    def setUp(self):
+
+        self.user = User.objects.create_user(username='cliente', password='senha-teste')
+        self.client.force_authenticate(user=self.user)
+
+        self.transaction_data = {
+            "description": "Mercado",
+            "amount": "150.00",
+            "type": "expense",
+            "date": "2023-12-10"
+        }
+
+    def create_transaction(self):
+        response = self.client.post(reverse('create_list'), self.transaction_data, format='json')
+        return response.data['id']
+
+
+
+    # --- ===================  TESTE 1: LOG DE ALTERAÇÕES  =================== ---
+    def test_changes_are_logged(self):
+        """
+        Testa se criação, atualização e deleção geram entradas no log.
+        """
+
+        transaction_id = self.create_transaction()
+        self.client.patch(reverse('retrieve_update_delete', args=[transaction_id]), {"amount": "200.00"}, format='json')
+        self.client.delete(reverse('retrieve_update_delete', args=[transaction_id]))
+
+        response = self.client.get(reverse('changes'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        ops = [change['op'] for change in response.data['changes']]
+        self.assertEqual(ops, ['create', 'update', 'delete'])
+
+        # O snapshot da atualização contém o novo valor e o tombstone não possui snapshot
+        self.assertEqual(response.data['changes'][1]['snapshot']['amount'], "200.00")
+        self.assertIsNone(response.data['changes'][2]['snapshot'])
+        self.assertEqual(response.data['changes'][2]['transaction_id'], transaction_id)
+
+
+
+    # --- ===================  TESTE 2: SINCRONIZAÇÃO INCREMENTAL  =================== ---
+    def test_sync_since_returns_only_delta(self):
+        """
+        Testa se `?since=` devolve apenas as alterações posteriores ao cursor.
+        """
+
+        self.create_transaction()
+        cursor = self.client.get(reverse('changes')).data['next_since']
+
+        second_id = self.create_transaction()
+
+        response = self.client.get(reverse('changes'), {'since': cursor})
+        self.assertEqual(len(response.data['changes']), 1)
+        self.assertEqual(response.data['changes'][0]['transaction_id'], second_id)
+        self.assertFalse(response.data['has_more'])
+
+        # Sem novas alterações, o cursor se mantém
+        response = self.client.get(reverse('changes'), {'since': response.data['next_since']})
+        self.assertEqual(response.data['changes'], [])
+
+
+
+    # --- ===================  TESTE 3: PAGINAÇÃO POR CURSOR  =================== ---
+    def test_sync_limit(self):
+        """
+        Testa se o `limit` pagina as alterações e indica que há mais.
+        """
+
+        for _ in range(3):
+            self.create_transaction()
+
+        response = self.client.get(reverse('changes'), {'limit': 2})
+        self.assertEqual(len(response.data['changes']), 2)
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(reverse('changes'), {'since': response.data['next_since'], 'limit': 2})
+        self.assertEqual(len(response.data['changes']), 1)
+        self.assertFalse(response.data['has_more'])
+
+
+
+    # --- ===================  TESTE 4: ISOLAMENTO POR USUÁRIO  =================== ---
+    def test_sync_only_returns_own_changes(self):
+        """
+        Testa se um usuário não recebe as alterações de outro.
+        """
+
+        self.create_transaction()
+
+        other = User.objects.create_user(username='outro', password='senha-teste')
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(reverse('changes'))
+        self.assertEqual(response.data['changes'], [])
+
+
+
+    # --- ===================  TESTE 5: COMPACTAÇÃO  =================== ---
+    def test_compaction(self):
+        """
+        Testa se a compactação mantém só o último estado de cada transação
+        e se cursores anteriores aos tombstones removidos são rejeitados.
+        """
+
+        kept_id = self.create_transaction()
+        self.client.patch(reverse('retrieve_update_delete', args=[kept_id]), {"amount": "99.00"}, format='json')
+
+        deleted_id = self.create_transaction()
+        self.client.delete(reverse('retrieve_update_delete', args=[deleted_id]))
+
+        old_cursor = TransactionChange.objects.filter(user=self.user).order_by('seq').first().seq
+
+        # Remove entradas substituídas e todos os tombstones
+        compact_changes(timezone.now() + timedelta(seconds=1))
+
+        remaining = list(TransactionChange.objects.filter(user=self.user).values_list('transaction_id', 'op'))
+        self.assertEqual(remaining, [(kept_id, 'update')])
+
+        # Sincronização completa continua funcionando
+        response = self.client.get(reverse('changes'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['changes'][0]['snapshot']['amount'], "99.00")
+
+        # Cursor antigo precisa refazer a sincronização
+        response = self.client.get(reverse('changes'), {'since': old_cursor})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+
+
+    # --- ===================  TESTE 6: COMPACTAÇÃO CONCORRENTE  =================== ---
+    def test_compaction_during_sync(self):
+        """
+        Testa se uma compactação concluída durante a sincronização (depois da
+        verificação antiga do horizonte) ainda resulta em 410.
+        """
+
+        deleted_id = self.create_transaction()
+        cursor = self.client.get(reverse('changes')).data['next_since']
+        self.client.delete(reverse('retrieve_update_delete', args=[deleted_id]))
+        self.create_transaction()
+
+        # A compactação acontece logo antes da leitura das alterações
+        original_filter = TransactionChange.objects.filter
+        patcher = mock.patch.object(TransactionChange.objects, 'filter')
+
+        def compact_then_filter(*args, **kwargs):
+            patcher.stop()
+            compact_changes(timezone.now() + timedelta(seconds=1))
+            return original_filter(*args, **kwargs)
+
+        patcher.start().side_effect = compact_then_filter
+        response = self.client.get(reverse('changes'), {'since': cursor})
+
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+
+
+    # --- ===================  TESTE 7: ESCRITAS PELO ADMIN  =================== ---
+    def test_admin_writes_are_logged(self):
+        """
+        Testa se criação, edição e deleção pelo admin também geram entradas no log.
+        """
+
+        admin_user = User.objects.create_superuser(username='admin', password='senha-teste')
+        self.client.force_login(admin_user)
+
+        form = {**self.transaction_data, "user": self.user.id}
+        self.client.post(reverse('admin:transaction_api_transaction_add'), form)
+        transaction = Transaction.objects.get(user=self.user)
+
+        form['amount'] = "300.00"
+        self.client.post(reverse('admin:transaction_api_transaction_change', args=[transaction.id]), form)
+        self.client.post(reverse('admin:transaction_api_transaction_delete', args=[transaction.id]), {"post": "yes"})
+
+        changes = TransactionChange.objects.filter(user=self.user).order_by('seq')
+        self.assertEqual([change.op for change in changes], ['create', 'update', 'delete'])
+        self.assertEqual(changes[1].snapshot['amount'], "300.00")
+
+
+
+    # --- ===================  TESTE 8: TROCA DE DONO PELO ADMIN  =================== ---
+    def test_admin_owner_change_logs_tombstone(self):
+        """
+        Testa se mover uma transação para outro usuário pelo admin gera um
+        tombstone para o dono anterior e uma atualização para o novo.
+        """
+
+        admin_user = User.objects.create_superuser(username='admin', password='senha-teste')
+        new_owner = User.objects.create_user(username='novo-dono', password='senha-teste')
+        transaction_id = self.create_transaction()
+
+        self.client.force_login(admin_user)
+        form = {**self.transaction_data, "user": new_owner.id}
+        self.client.post(reverse('admin:transaction_api_transaction_change', args=[transaction_id]), form)
+
+        previous = TransactionChange.objects.filter(user=self.user).order_by('seq')
+        self.assertEqual([change.op for change in previous], ['create', 'delete'])
+
+        current = TransactionChange.objects.get(user=new_owner)
+        self.assertEqual((current.op, current.transaction_id), ('update', transaction_id))
+
+
+class ChangeLogBackfillMigrationTests(TransactionTestCase):
+
+    migrate_from = [('transaction_api', '0003_idempotency_key')]
+    migrate_to = [('transaction_api', '0004_backfill_transaction_changes')]
+
+    # Volta o banco para o estado anterior ao backfill
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.migrate_from)
+        self.old_apps = self.executor.loader.project_state(self.migrate_from).apps
+
+    # Restaura o banco para a última migração
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+
+    # --- ===================  TESTE 1: TRANSAÇÕES ANTERIORES AO LOG  =================== ---
+    def test_backfill_existing_transactions(self):
+        """
+        Testa se a migração de backfill, rodando com os modelos históricos,
+        cria uma entrada `create` com snapshot para as transações que ainda
+        não estão no log (sem duplicar as que já estão).
+        """
+
+        OldUser = self.old_apps.get_model('auth', 'User')
+        OldTransaction = self.old_apps.get_model('transaction_api', 'Transaction')
+        OldTransactionChange = self.old_apps.get_model('transaction_api', 'TransactionChange')
+
+        user = OldUser.objects.create(username='antigo')
+        logged = OldTransaction.objects.create(user=user, description="Mercado", amount=Decimal('150'), type='expense', date=date(2023, 12, 10))
+        OldTransactionChange.objects.create(user=user, op='create', transaction_id=logged.id, snapshot={"id": logged.id})
+        transaction = OldTransaction.objects.create(user=user, description="Salário", amount=Decimal('5000.5'), type='income', date=date(2023, 12, 1))
+
+        MigrationExecutor(connection).migrate(self.migrate_to)
+
+        self.assertEqual(TransactionChange.objects.filter(transaction_id=logged.id).count(), 1)
+
+        change = TransactionChange.objects.get(transaction_id=transaction.id)
+        self.assertEqual(change.op, 'create')
+        self.assertEqual(change.snapshot, {
+            "id": transaction.id,
+            "description": "Salário",
+            "amount": "5000.50",
+            "type": "income",
+            "date": "2023-12-01"
+        })
+
+
+class TransactionAnalyticsTests(APITestCase):
+
+    # Configurações iniciais antes de rodar os testes
+    def setUp(self):
+
+        cache.clear()
+
+        self.user = User.objects.create_user(username='analista', password='senha-teste')
+        self.client.force_authenticate(user=self.user)
+
+    def transaction_queries(self, context):
+        """
+        Consultas capturadas que leem a tabela de transações.
+        """
+
+        table = Transaction._meta.db_table
+        return [query['sql'] for query in context.captured_queries if f'"{table}"' in query['sql']]
+
+    def seed(self, quantity):
+        """
+        Cria `quantity` transações variando tipo, valor e data.
+        """
+
+        Transaction.objects.bulk_create([
+            Transaction(
+                description=f"Transação {index}",
+                amount=(index % 50) * 37 + 1,
+                type='expense' if index % 3 else 'income',
+                date=date(2023, index % 12 + 1, index % 28 + 1),
+                user=self.user
+            )
+            for index in range(quantity)
+        ])
+
+
+
+    # --- ===================  TESTE 1: HISTOGRAMAS  =================== ---
+    def test_analytics_breakdown(self):
+        """
+        Testa os valores de cada histograma.
+        """
+
+        Transaction.objects.create(description="Salário", amount=5000, type='income', date="2023-12-01", user=self.user)   # sexta-feira
+        Transaction.objects.create(description="Aluguel", amount=1200, type='expense', date="2023-12-04", user=self.user)  # segunda-feira
+        Transaction.objects.create(description="Café", amount=8, type='expense', date="2023-11-06", user=self.user)        # segunda-feira
+
+        response = self.client.get(reverse('analytics'), {'top': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+
+        self.assertEqual(data['totals']['expense'], {"count": 2, "total": 1208})
+        self.assertEqual(data['totals']['income'], {"count": 1, "total": 5000})
+
+        # Faixas: café em [0, 10), aluguel em [1000, 5000) e salário em [5000, ∞)
+        buckets = {(bucket['min'], bucket['max']): bucket for bucket in data['amount_buckets']}
+        self.assertEqual(buckets[(0, 10)]['expense']['count'], 1)
+        self.assertEqual(buckets[(1000, 5000)]['expense']['count'], 1)
+        self.assertEqual(buckets[(5000, None)]['income']['count'], 1)
+
+        self.assertEqual(data['weekdays'][0]['expense'], {"count": 2, "total": 1208})
+        self.assertEqual(data['weekdays'][4]['income'], {"count": 1, "total": 5000})
+
+        self.assertEqual([month['month'] for month in data['months']], ['2023-11', '2023-12'])
+
+        self.assertEqual(len(data['top_expenses']), 1)
+        self.assertEqual(data['top_expenses'][0]['description'], "Aluguel")
+
+
+
+    # --- ===================  TESTE 2: QUANTIDADE DE CONSULTAS  =================== ---
+    def test_analytics_query_count_is_constant(self):
+        """
+        Testa se a quantidade de consultas não cresce com o volume de dados.
+        """
+
+        # O total inclui as consultas do cache (DatabaseCache), também constantes
+        self.seed(10)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('analytics'))
+
+        cache.clear()
+        self.seed(1000)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse('analytics'))
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(self.transaction_queries(small)), 5)
+        self.assertEqual(len(self.transaction_queries(large)), 5)
+
+        # Nenhuma função Python (UDF do SQLite) é chamada por linha
+        for query in self.transaction_queries(large):
+            self.assertNotIn('django_date_', query)
+
+
+
+    # --- ===================  TESTE 3: CACHE  =================== ---
+    def test_analytics_cache_invalidated_on_write(self):
+        """
+        Testa se o resultado vem do cache e se é invalidado após uma escrita.
+        """
+
+        self.seed(10)
+        first = self.client.get(reverse('analytics')).data
+
+        # Segunda chamada lê apenas o cache, sem consultar as transações
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(reverse('analytics'))
+        self.assertEqual(self.transaction_queries(cached), [])
+
+        # Uma escrita pela API invalida o cache (no commit)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('create_list'), {"description": "Nova", "amount": "10.00", "type": "income", "date": "2023-01-01"}, format='json')
+
+        response = self.client.get(reverse('analytics'))
+        self.assertEqual(response.data['totals']['income']['count'], first['totals']['income']['count'] + 1)
+
+
+
+
+
+    # --- ===================  TESTE 4: CACHE INDISPONÍVEL  =================== ---
+    def test_cache_failure_does_not_break_writes(self):
+        """
+        Testa se uma falha do cache não transforma uma escrita confirmada em
+        erro e se o analytics continua respondendo sem o cache.
+        """
+
+        with mock.patch.object(cache, 'delete', side_effect=OperationalError("no such table: django_cache")):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('create_list'), {"description": "Nova", "amount": "10.00", "type": "income", "date": "2023-01-01"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        with mock.patch.object(cache, 'get', side_effect=OperationalError("no such table: django_cache")):
+            response = self.client.get(reverse('analytics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals']['income']['count'], 1)
+
+class IdempotencyKeyTests(APITestCase):
+
+    # Configurações iniciais antes de rodar os testes
+    def setUp(self):
+
+        self.user = User.objects.create_user(username='idempotente', password='senha-teste')
+        self.client.force_authenticate(user=self.user)
+
+        self.transaction_data = {
+            "description": "Salário",
+            "amount": "5000.00",
+            "type": "income",
+            "date": "2023-12-01"
+        }
+
+
+
+    # --- ===================  TESTE 1: POST REPETIDO  =================== ---
+    def test_post_retry_does_not_duplicate(self):
+        """
+        Testa se repetir um POST com a mesma chave devolve a resposta original
+        sem criar outra transação e sem consultar a tabela de transações.
+        """
+
+        url = reverse('create_list')
+        first = self.client.post(url, self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        # Apenas a leitura da chave armazenada
+        with self.assertNumQueries(1):
+            retry = self.client.post(url, self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        # Sem o header, cada POST cria uma transação
+        self.client.post(url, self.transaction_data, format='json')
+        self.assertEqual(Transaction.objects.count(), 2)
+
+
+
+    # --- ===================  TESTE 2: CHAVE REUTILIZADA  =================== ---
+    def test_key_reused_with_different_body(self):
+        """
+        Testa se a mesma chave com outro conteúdo é rejeitada.
+        """
+
+        url = reverse('create_list')
+        self.client.post(url, self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+
+        self.transaction_data['amount'] = "10.00"
+        response = self.client.post(url, self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+
+    # --- ===================  TESTE 3: PATCH REPETIDO  =================== ---
+    def test_patch_retry_and_keys_per_user(self):
+        """
+        Testa o PATCH repetido e se as chaves são separadas por usuário.
+        """
+
+        transaction = Transaction.objects.create(user=self.user, **self.transaction_data)
+        url = reverse('retrieve_update_delete', args=[transaction.id])
+
+        self.client.patch(url, {"amount": "10.00"}, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+        self.client.patch(url, {"amount": "10.00"}, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+        self.assertEqual(TransactionChange.objects.filter(transaction_id=transaction.id).count(), 1)
+
+        # A mesma chave de outro usuário não devolve a resposta armazenada
+        other = User.objects.create_user(username='outro', password='senha-teste')
+        self.client.force_authenticate(user=other)
+        response = self.client.patch(url, {"amount": "10.00"}, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+
+    # --- ===================  TESTE 4: EXPIRAÇÃO  =================== ---
+    def test_expired_keys(self):
+        """
+        Testa se chaves expiradas são reaproveitadas e removidas pela limpeza.
+        """
+
+        url = reverse('create_list')
+        self.client.post(url, self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        # Chave expirada: a requisição é executada novamente
+        response = self.client.post(url, self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+        self.client.post(url, self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-2')
+        self.assertEqual(purge_expired_keys(timezone.now() + timedelta(days=2)), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 0)
+
+
+
+    # --- ===================  TESTE 5: LOCK NÃO OBTIDO  =================== ---
+    def test_lock_timeout_returns_conflict(self):
+        """
+        Testa se, quando o lock não é obtido a tempo, a API responde 409 em vez de 500.
+        """
+
+        with mock.patch.object(IdempotencyKey.objects, 'select_for_update', side_effect=OperationalError("database is locked")):
+            response = self.client.post(reverse('create_list'), self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-1')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', "Testa o lock do SQLite com o banco de testes em arquivo.")
+class IdempotencyConcurrencyTests(TransactionTestCase):
+
+    # Configurações iniciais antes de rodar os testes
+    def setUp(self):
+
+        self.user = User.objects.create_user(username='concorrente', password='senha-teste')
+
+        self.transaction_data = {
+            "description": "Salário",
+            "amount": "5000.00",
+            "type": "income",
+            "date": "2023-12-01"
+        }
+
+
+
+    # --- ===================  TESTE 1: POSTS SIMULTÂNEOS  =================== ---
+    def test_concurrent_duplicates_are_serialized(self):
+        """
+        Testa se dois POSTs simultâneos com a mesma chave criam uma única
+        transação e se o segundo recebe a resposta armazenada do primeiro.
+        """
+
+        self.assertNotEqual(connection.settings_dict['NAME'], ':memory:')
+        self.assertFalse(connection.is_in_memory_db())
+
+        barrier = Barrier(2)
+        responses = []
+
+        # Segura o lock de escrita da primeira requisição para garantir a sobreposição
+        record_change = views.record_change
+
+        def slow_record_change(*args, **kwargs):
+            sleep(0.3)
+            return record_change(*args, **kwargs)
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            try:
+                barrier.wait()
+                responses.append(client.post(reverse('create_list'), self.transaction_data, format='json', HTTP_IDEMPOTENCY_KEY='chave-1'))
+            finally:
+                connection.close()
+
+        with mock.patch.object(views, 'record_change', side_effect=slow_record_change):
+            threads = [Thread(target=post) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_201_CREATED] * 2)
+        self.assertEqual(responses[0].data, responses[1].data)
+        self.assertEqual(sum(response.has_header('Idempotent-Replayed') for response in responses), 1)
+        self.assertEqual(Transaction.objects.count(), 1)
@@ -4,5 +4,6 @@ from . import views
 
 urlpatterns = [
     path('', views.transactions_manager, name='create_list'),
+    path('changes/', views.transactions_changes, name='changes'),
     path('<int:id>/', views.transaction_specific_manager, name='retrieve_update_delete')
 ]
@@ -3,5 +3,6 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('', views.transactions_summary, name='summary')
+    path('', views.transactions_summary, name='summary'),
+    path('analytics/', views.transactions_analytics, name='analytics')
 ]
@@ -6,14 +6,25 @@ from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework import status
 
+from django.db import transaction as db_transaction
 from django.db.models import Sum
-from .models import Transaction
-from .serializers import TransactionSerializer
+from .models import Transaction, TransactionChange
+from .serializers import TransactionSerializer, TransactionChangeSerializer
+from .changelog import record_change, get_horizon
+from .analytics import get_analytics, invalidate_analytics
+from .idempotency import idempotent
 
 import json
 
+# Quantidade máxima de alterações devolvidas por chamada de sincronização
+CHANGES_PAGE_SIZE = 500
+
+# Quantidade máxima de maiores despesas devolvidas pelo analytics
+ANALYTICS_MAX_TOP = 50
+
 @api_view(['POST', 'GET'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def transactions_manager(request):
     """
     Gerencia a criação e listagem das transações.
@@ -22,6 +33,8 @@ def transactions_manager(request):
     - **POST**: Cria uma nova transação.
         - *Campos obrigatórios*: `amount`, `type`, `date`.
         - O usuário é atribuído automaticamente com base no token de autenticação.
+        - Aceita o header `Idempotency-Key`: uma nova tentativa com a mesma chave
+          devolve a resposta original, sem criar outra transação.
 
     - **GET**: Retorna a lista de transações do usuário logado.
         - *Filtros opcionais na URL:*
@@ -38,7 +51,10 @@ def transactions_manager(request):
         transaction_serializer = TransactionSerializer(data=new_transaction)
 
         if transaction_serializer.is_valid():
-            transaction_serializer.save(user=request.user)
+            with db_transaction.atomic():
+                transaction_serializer.save(user=request.user)
+                record_change(request.user, TransactionChange.Operation.CREATE, transaction_serializer.instance.id, transaction_serializer.data)
+            invalidate_analytics(request.user)
             return Response(transaction_serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response(transaction_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -83,6 +99,7 @@ def transactions_manager(request):
 
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def transaction_specific_manager(request, id):
     """
     Gerencia uma transação específica identificada pelo ID 
@@ -96,6 +113,8 @@ def transaction_specific_manager(request, id):
     - **PUT**: Atualiza a transação inteira (todos os campos são validados).
     - **PATCH**: Atualiza parcialmente.
     - **DELETE**: Remove a transação permanentemente.
+
+    PUT e PATCH aceitam o header `Idempotency-Key` (ver `idempotency.idempotent`).
     """
 
     try:
@@ -118,18 +137,86 @@ def transaction_specific_manager(request, id):
             transaction_serializer = TransactionSerializer(transaction, data=updated_data, partial=True)
 
         if transaction_serializer.is_valid():
-            transaction_serializer.save()
+            with db_transaction.atomic():
+                transaction_serializer.save()
+                record_change(request.user, TransactionChange.Operation.UPDATE, transaction.id, transaction_serializer.data)
+            invalidate_analytics(request.user)
             return Response(transaction_serializer.data, status=status.HTTP_200_OK)
         else:
             return Response(transaction_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
     # Deletando uma transação específica
     if request.method == 'DELETE':
-        transaction.delete()
+        with db_transaction.atomic():
+            record_change(request.user, TransactionChange.Operation.DELETE, transaction.id)
+            transaction.delete()
+        invalidate_analytics(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     return Response(status=status.HTTP_400_BAD_REQUEST)
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def transactions_changes(request):
+    """
+    Sincronização incremental das transações do usuário (change feed).
+
+    Retorna apenas as alterações posteriores ao cursor informado, em ordem
+    de `seq`. Deleções aparecem como tombstones (`op = delete`, sem snapshot).
+
+    Query Params:
+    - `?since=N`: Último `seq` já aplicado pelo cliente (padrão: 0).
+    - `?limit=N`: Quantidade máxima de alterações por resposta (padrão/máximo: 500).
+
+    Retorna um JSON com:
+    - `changes`: Lista de alterações (`seq`, `op`, `transaction_id`, `snapshot`).
+    - `next_since`: Cursor a ser enviado na próxima chamada.
+    - `has_more`: Indica se ainda há alterações após esta página.
+
+    Se o cursor for anterior ao ponto já compactado, retorna 410 Gone e o
+    cliente deve refazer a sincronização completa com `?since=0`.
+    """
+
+    if request.method != 'GET':
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    # Recolhe e valida o cursor e o limite
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = int(request.query_params.get('limit', CHANGES_PAGE_SIZE))
+    except ValueError:
+        return Response({"detail": "`since` e `limit` devem ser números inteiros."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if since < 0 or limit < 1:
+        return Response({"detail": "`since` e `limit` devem ser positivos."}, status=status.HTTP_400_BAD_REQUEST)
+    limit = min(limit, CHANGES_PAGE_SIZE)
+
+    # Busca uma alteração a mais para saber se há próxima página
+    changes = list(
+        TransactionChange.objects
+        .filter(user=request.user, seq__gt=since)
+        .order_by('seq')[:limit + 1]
+    )
+
+    # Cursor anterior à compactação: deleções podem ter sido perdidas.
+    # O horizonte é lido depois das alterações: se uma compactação terminou
+    # antes da busca acima (e removeu tombstones dela), o novo horizonte já é visto aqui
+    if since > 0 and since < get_horizon(request.user):
+        return Response({"detail": "Cursor expirado, refaça a sincronização com `since=0`."}, status=status.HTTP_410_GONE)
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    response = {
+        "changes": TransactionChangeSerializer(changes, many=True).data,
+        "next_since": changes[-1].seq if changes else since,
+        "has_more": has_more
+    }
+
+    return Response(response, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def transactions_summary(request):
@@ -172,4 +259,39 @@ def transactions_summary(request):
         "net_balance": net_balance
     }
 
-    return Response(summary, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response(summary, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def transactions_analytics(request):
+    """
+    Retorna os histogramas das transações do usuário em uma única chamada.
+
+    As agregações são feitas no banco com um número fixo de consultas
+    (GROUP BY), e o resultado fica em cache por usuário até a próxima escrita.
+
+    Query Params:
+    - `?top=N`: Quantidade de maiores despesas (padrão: 5, máximo: 50).
+
+    Retorna um JSON com:
+    - `totals`: Quantidade e soma por tipo.
+    - `amount_buckets`: Quantidade e soma por tipo em cada faixa de valor (`min` <= amount < `max`).
+    - `weekdays`: Quantidade e soma por tipo em cada dia da semana (1 = segunda ... 7 = domingo).
+    - `months`: Quantidade e soma por tipo em cada mês (`YYYY-MM`).
+    - `top_expenses`: As maiores despesas.
+    """
+
+    if request.method != 'GET':
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        top = int(request.query_params.get('top', 5))
+    except ValueError:
+        return Response({"detail": "`top` deve ser um número inteiro."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if top < 0:
+        return Response({"detail": "`top` deve ser positivo."}, status=status.HTTP_400_BAD_REQUEST)
+    top = min(top, ANALYTICS_MAX_TOP)
+
+    return Response(get_analytics(request.user, top), status=status.HTTP_200_OK)